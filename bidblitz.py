@@ -16,8 +16,14 @@ requirements:
 7. admin declares the winner
 8. winner delaration process -> member with the lowest bid and first one if not unique
 9. list of past events, ordered
+10. state survives a restart (append-only journal + periodic snapshots)
 
 """
+import os
+import pickle
+import struct
+import threading
+import zlib
 from abc import ABC
 from datetime import datetime
 
@@ -48,12 +54,17 @@ class PlayerController:
     
     def __init__(self):
         self.players = []
+        self.store = None
 
     def add(self, name, coins):
         player = Player(name, coins)
-        self.players.append(player)
+        if self.store: self.store.record(Journal.ADD_PLAYER, name, coins)
+        self._add(player)
         print("Member added to the game")
 
+    def _add(self, player: Player):
+        self.players.append(player)
+
     def get(self, id):
         if id >= len(self.players): return None
         return self.players[id]
@@ -68,6 +79,7 @@ class Event:
         self.date = datetime.strptime(date, "%y-%m-%d").date()
         self.participants = []
         self.bids = []
+        self.winner = None
 
 class WinningStrategy:
     def __init__(self, bids) -> None:
@@ -89,6 +101,7 @@ class EventController:
         self.events = []
         self.Strategy = Strategy
         self.player_controller = player_controller
+        self.store = None
     
     def add(self, name, prize, date):
         new_event = Event(name, prize, date)
@@ -96,8 +109,13 @@ class EventController:
             if event.date == new_event.date:
                 del new_event
                 raise Exception("Two events cannot be posted on same date.")
-        self.events.append(new_event)
+        if self.store: self.store.record(Journal.ADD_EVENT, name, prize, date)
+        self._add(new_event)
+        if self.store: self.store.maybe_snapshot()
         print("New event added to the game")
+
+    def _add(self, event: Event):
+        self.events.append(event)
     
     def get(self, id):
         return self.events[id]
@@ -110,7 +128,11 @@ class EventController:
         if player_id in event.participants:
             print(f"Player already registered for the event_id {event_id}")
             return
-        event.participants.append(player_id)
+        if self.store: self.store.record(Journal.REGISTER_PLAYER, player_id, event_id)
+        self._register_player(player_id, event_id)
+
+    def _register_player(self, player_id, event_id):
+        self.events[event_id].participants.append(player_id)
 
     def submit_bid(self, player_id, event_id, *bids):
         if len(bids) > Event.MAX_ALLOWED_BIDS:
@@ -128,10 +150,15 @@ class EventController:
         player = self.player_controller.get(id = player_id)
         if max(bids) > player.coins:
             raise Exception("Player does not have necessary coins!!")
-        player.coins -= max(bids)
-        event.bids.append((player_id, bids))
+        if self.store: self.store.record(Journal.SUBMIT_BID, player_id, event_id, *bids)
+        self._submit_bid(player_id, event_id, bids)
         print("bids added successfully")
 
+    def _submit_bid(self, player_id, event_id, bids):
+        player = self.player_controller.get(id = player_id)
+        player.coins -= max(bids)
+        self.events[event_id].bids.append((player_id, tuple(bids)))
+
     def get_winner(self, event_id):
         event = self.events[event_id]
         if len(event.participants) == 0:
@@ -139,8 +166,14 @@ class EventController:
             return
         winner_idx, min_bid = self.Strategy(event.bids).compute()
         player = self.player_controller.get(id = winner_idx)
+        if self.store: self.store.record(Journal.DECLARE_WINNER, event_id, winner_idx, min_bid)
+        self._declare_winner(event_id, winner_idx, min_bid)
+        if self.store: self.store.maybe_snapshot()
         print(f"{player.name} won the game with {min_bid} and gets {event.prize}")
 
+    def _declare_winner(self, event_id, player_id, min_bid):
+        self.events[event_id].winner = (player_id, min_bid)
+
 
 class MinBetStrategy(WinningStrategy):
     def __init__(self, bids) -> None:
@@ -154,21 +187,264 @@ class MinBetStrategy(WinningStrategy):
                     winner = bid[0]
                     min_bid = amount
         return winner, min_bid
-    
+
+
+class Journal:
+    """Append-only binary log of state changes, written ahead of the change itself.
+
+    Every record is written straight to the file, so a process crash loses
+    nothing. fsync runs once `sync_every` records are pending or
+    `sync_interval` seconds after the first pending record, whichever comes
+    first, so a power loss or OS crash loses at most that much.
+    Record layout: payload length, crc32, seq, op, payload.
+    A record that cannot be encoded or fully written raises and leaves the
+    journal as it was, so the caller must not apply the change.
+    """
+    ADD_PLAYER, ADD_EVENT, REGISTER_PLAYER, SUBMIT_BID, DECLARE_WINNER = range(1, 6)
+    HEADER = struct.Struct("<IIQB")
+
+    def __init__(self, path, sync_every=64, sync_interval=0.05):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.timer = None
+        self.seq = 0
+        self.size = 0
+        self.pending = 0
+        self.file = None
+
+    def replay(self):
+        """Returns all intact records and opens the journal for appending.
+
+        A torn final record (crash mid-write) is cut off. A bad record with
+        intact records after it is real corruption and raises, leaving the
+        file untouched.
+        """
+        data = b""
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                data = f.read()
+        records, offset = [], 0
+        while offset + self.HEADER.size <= len(data):
+            length, crc, seq, op = self.HEADER.unpack_from(data, offset)
+            start = offset + self.HEADER.size
+            end = start + length
+            if end > len(data):
+                break
+            if zlib.crc32(data[offset + 8:end]) != crc:
+                if end == len(data):
+                    break
+                raise Exception(f"Journal {self.path} is corrupt at offset {offset}")
+            records.append((seq, op, self._decode(data, start, end)))
+            offset = end
+        self.file = open(self.path, "ab", buffering=0)
+        if offset < len(data):
+            os.ftruncate(self.file.fileno(), offset)
+        self.size = offset
+        if records:
+            self.seq = records[-1][0]
+        return records
+
+    def append(self, op, *args):
+        payload = self._encode(args)
+        with self.lock:
+            body = struct.pack("<QB", self.seq + 1, op) + payload
+            record = struct.pack("<II", len(payload), zlib.crc32(body)) + body
+            try:
+                if self.file.write(record) != len(record):
+                    raise OSError("Short write to the journal")
+            except OSError:
+                # drop whatever part of the record made it to the file
+                os.ftruncate(self.file.fileno(), self.size)
+                raise
+            self.seq += 1
+            self.size += len(record)
+            self.pending += 1
+            if self.pending >= self.sync_every:
+                self._sync()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.sync_interval, self.sync)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def sync(self):
+        with self.lock:
+            self._sync()
+
+    def _sync(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.pending:
+            os.fsync(self.file.fileno())
+            self.pending = 0
+
+    def reset(self):
+        # everything up to self.seq is covered by a snapshot now
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            os.ftruncate(self.file.fileno(), 0)
+            os.fsync(self.file.fileno())
+            self.size = 0
+            self.pending = 0
+
+    def close(self):
+        with self.lock:
+            self._sync()
+            self.file.close()
+
+    @staticmethod
+    def _encode(args):
+        out = []
+        for arg in args:
+            if isinstance(arg, str):
+                raw = arg.encode()
+                out.append(struct.pack("<cI", b"s", len(raw)) + raw)
+            elif isinstance(arg, float):
+                out.append(struct.pack("<cd", b"f", arg))
+            elif isinstance(arg, int) and -2**63 <= arg < 2**63:
+                out.append(struct.pack("<cq", b"i", arg))
+            else:
+                raise Exception(f"Cannot journal value {arg!r}")
+        return b"".join(out)
+
+    @staticmethod
+    def _decode(data, start, end):
+        args = []
+        while start < end:
+            tag = data[start:start + 1]
+            start += 1
+            if tag == b"s":
+                (size,) = struct.unpack_from("<I", data, start)
+                start += 4
+                args.append(data[start:start + size].decode())
+                start += size
+            else:
+                (value,) = struct.unpack_from("<d" if tag == b"f" else "<q", data, start)
+                start += 8
+                args.append(value)
+        return args
+
+
+class StateStore:
+    """Journals controller changes and restores them after a restart.
+
+    Creating the store restores the controllers right away (latest snapshot
+    plus the journal records written after it) and attaches itself to them,
+    so every later change is journaled.
+
+    `snapshot()` pickles every player and event and does two fsyncs, so it
+    is never taken inside a bid. Instead the event controller calls
+    `maybe_snapshot()` between sales (a new event or a declared winner),
+    which snapshots once `snapshot_every` records have piled up and
+    otherwise fsyncs the journal. The journal
+    tail replayed on restart is therefore bounded by `snapshot_every` plus
+    the records of the sale in progress.
+    """
+    def __init__(self, directory, player_controller: PlayerController, event_controller: EventController,
+                 sync_every=64, sync_interval=0.05, snapshot_every=10000):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.snapshot_path = os.path.join(directory, "snapshot.bin")
+        self.journal = Journal(os.path.join(directory, "journal.bin"), sync_every, sync_interval)
+        self.player_controller = player_controller
+        self.event_controller = event_controller
+        self.snapshot_every = snapshot_every
+        self.since_snapshot = 0
+        self._restore()
+
+    def _restore(self):
+        seq = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as f:
+                seq, self.player_controller.players, self.event_controller.events = pickle.load(f)
+        for record_seq, op, args in self.journal.replay():
+            # records older than the snapshot remain if we crashed before the journal reset
+            if record_seq <= seq:
+                continue
+            self._apply(op, args)
+            self.since_snapshot += 1
+        self.journal.seq = max(self.journal.seq, seq)
+        self.player_controller.store = self
+        self.event_controller.store = self
+
+    def _apply(self, op, args):
+        if op == Journal.ADD_PLAYER:
+            self.player_controller._add(Player(*args))
+        elif op == Journal.ADD_EVENT:
+            self.event_controller._add(Event(*args))
+        elif op == Journal.REGISTER_PLAYER:
+            self.event_controller._register_player(*args)
+        elif op == Journal.SUBMIT_BID:
+            player_id, event_id, *bids = args
+            self.event_controller._submit_bid(player_id, event_id, bids)
+        elif op == Journal.DECLARE_WINNER:
+            self.event_controller._declare_winner(*args)
+        else:
+            raise Exception(f"Unknown journal op {op}")
+
+    def record(self, op, *args):
+        self.journal.append(op, *args)
+        self.since_snapshot += 1
+
+    def maybe_snapshot(self):
+        if self.since_snapshot >= self.snapshot_every:
+            self.snapshot()
+        else:
+            self.journal.sync()
+
+    def snapshot(self):
+        state = (self.journal.seq, self.player_controller.players, self.event_controller.events)
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        dir_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        self.journal.reset()
+        self.since_snapshot = 0
+
+    def close(self):
+        self.player_controller.store = None
+        self.event_controller.store = None
+        self.journal.close()
+
 
 if __name__ == "__main__":
-    player_controller = PlayerController()
-    event_controller = EventController(player_controller, MinBetStrategy)
-    player_controller.add("Aman", 5000)
-    player_controller.add("Divyanshu", 7000)
-    player_controller.add("Keshav", 7000)
-
-    event_controller.add("bbd", "iphone 14", "23-06-06")
-    event_controller.add("bbd 24", "iphone 15", "23-06-06")
-    event_controller.register_player(0, 0)
-    event_controller.register_player(1, 0)
-    event_controller.submit_bid(0, 0, 100, 200, 400, 500)
-    event_controller.submit_bid(1, 0, 100, 200, 300, 400, 500)
-    # event_controller.submit_bid(2, 0, 100, 200, 300, 400, 500)
-    
-    event_controller.get_winner(0)
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        player_controller = PlayerController()
+        event_controller = EventController(player_controller, MinBetStrategy)
+        store = StateStore(data_dir, player_controller, event_controller)
+        player_controller.add("Aman", 5000)
+        player_controller.add("Divyanshu", 7000)
+        player_controller.add("Keshav", 7000)
+
+        event_controller.add("bbd", "iphone 14", "23-06-06")
+        event_controller.add("bbd 24", "iphone 15", "23-06-07")
+        event_controller.register_player(0, 0)
+        event_controller.register_player(1, 0)
+        event_controller.submit_bid(0, 0, 100, 200, 400, 500)
+        event_controller.submit_bid(1, 0, 100, 200, 300, 400, 500)
+        # event_controller.submit_bid(2, 0, 100, 200, 300, 400, 500)
+        
+        event_controller.get_winner(0)
+        store.snapshot()
+        store.close()
+
+        # restart: state comes back from the snapshot and journal
+        player_controller = PlayerController()
+        event_controller = EventController(player_controller, MinBetStrategy)
+        store = StateStore(data_dir, player_controller, event_controller)
+        winner_id, min_bid = event_controller.get(0).winner
+        print(f"Restored: {player_controller.get(winner_id).name} won event 0 with {min_bid}")
+        store.close()
@@ -0,0 +1,180 @@
+import time
+
+import pytest
+
+from bidblitz import EventController, Journal, MinBetStrategy, PlayerController, StateStore
+
+
+def open_store(directory, **kwargs):
+    pc = PlayerController()
+    ec = EventController(pc, MinBetStrategy)
+    return pc, ec, StateStore(str(directory), pc, ec, **kwargs)
+
+
+def state(pc, ec):
+    return ([(p.name, p.coins) for p in pc.players],
+            [(e.name, e.prize, e.date, list(e.participants), list(e.bids), e.winner) for e in ec.events])
+
+
+def build(pc, ec, store):
+    for i in range(200):
+        pc.add(f"player {i}", 1000 + i)
+    ec.add("bbd", "iphone 14", "23-06-06")
+    ec.add("bbd 24", "iphone 15", "23-06-07")
+    store.snapshot()
+    for i in range(200):
+        ec.register_player(i, 0)
+    for i in range(100):
+        ec.submit_bid(i, 0, 50 + i, 300 - i, 7.5 + i)
+    ec.get_winner(0)
+
+
+def test_restart_restores_state(tmp_path):
+    pc, ec, store = open_store(tmp_path)
+    build(pc, ec, store)
+    expected = state(pc, ec)
+    store.close()
+
+    pc, ec, store = open_store(tmp_path)
+    assert state(pc, ec) == expected
+    assert ec.get(0).winner == (0, 7.5)
+    assert pc.get(0).coins == 1000 - 300
+    store.close()
+
+
+def test_unencodable_value_changes_nothing(tmp_path):
+    pc, ec, store = open_store(tmp_path)
+    pc.add("Aman", 5000)
+    with pytest.raises(Exception):
+        pc.add("too rich", 2**63)
+    assert len(pc.players) == 1
+    store.close()
+
+    pc, ec, store = open_store(tmp_path)
+    assert [p.name for p in pc.players] == ["Aman"]
+    store.close()
+
+
+def test_torn_tail_is_cut_off(tmp_path):
+    pc, ec, store = open_store(tmp_path)
+    build(pc, ec, store)
+    expected = state(pc, ec)
+    store.close()
+    with open(store.journal.path, "ab") as f:
+        f.write(b"\x09\x00\x00\x00\x01")  # crash in the middle of a record
+
+    pc, ec, store = open_store(tmp_path)
+    assert state(pc, ec) == expected
+    ec.register_player(5, 1)
+    ec.submit_bid(5, 1, 10)
+    expected = state(pc, ec)
+    store.close()
+
+    pc, ec, store = open_store(tmp_path)
+    assert state(pc, ec) == expected
+    store.close()
+
+
+def test_stale_journal_after_snapshot_is_skipped(tmp_path):
+    pc, ec, store = open_store(tmp_path)
+    build(pc, ec, store)
+    expected = state(pc, ec)
+    with open(store.journal.path, "rb") as f:
+        stale_journal = f.read()
+    store.snapshot()
+    store.close()
+    with open(store.journal.path, "wb") as f:
+        f.write(stale_journal)  # crash before journal.reset()
+
+    pc, ec, store = open_store(tmp_path)
+    assert state(pc, ec) == expected
+    pc.add("late joiner", 10)
+    expected = state(pc, ec)
+    store.close()
+
+    pc, ec, store = open_store(tmp_path)
+    assert state(pc, ec) == expected
+    store.close()
+
+
+def test_snapshots_between_sales_bound_the_journal_tail(tmp_path):
+    pc, ec, store = open_store(tmp_path, snapshot_every=100)
+    for i in range(150):
+        pc.add(f"player {i}", 1000)
+    for sale in range(3):
+        ec.add(f"sale {sale}", "iphone", f"23-06-0{sale + 1}")
+        assert store.since_snapshot <= 1
+        for i in range(150):
+            ec.register_player(i, sale)
+        for i in range(50):
+            ec.submit_bid(i, sale, sale + i + 1)
+        assert store.since_snapshot >= 200  # no snapshot in the middle of a sale
+        ec.get_winner(sale)
+        assert store.since_snapshot == 0
+    expected = state(pc, ec)
+    store.close()
+
+    pc, ec, store = open_store(tmp_path, snapshot_every=100)
+    assert store.since_snapshot == 0
+    assert state(pc, ec) == expected
+    store.close()
+
+
+def test_pending_records_are_synced_after_sync_interval(tmp_path):
+    pc, ec, store = open_store(tmp_path, sync_every=1000, sync_interval=0.01)
+    pc.add("Aman", 5000)
+    assert store.journal.pending == 1
+    time.sleep(0.2)
+    assert store.journal.pending == 0
+    store.close()
+
+
+def test_declaring_a_winner_syncs_the_journal(tmp_path):
+    pc, ec, store = open_store(tmp_path, sync_every=1000, sync_interval=60)
+    pc.add("Aman", 5000)
+    ec.add("bbd", "iphone 14", "23-06-06")
+    ec.register_player(0, 0)
+    ec.submit_bid(0, 0, 100)
+    assert store.journal.pending == 2
+    ec.get_winner(0)
+    assert store.journal.pending == 0
+    store.close()
+
+
+def test_close_detaches_the_store(tmp_path):
+    pc, ec, store = open_store(tmp_path)
+    store.close()
+    assert pc.store is None and ec.store is None
+    pc.add("Aman", 5000)
+    assert [p.name for p in pc.players] == ["Aman"]
+
+
+def test_corrupt_final_record_is_cut_off(tmp_path):
+    pc, ec, store = open_store(tmp_path)
+    pc.add("Aman", 5000)
+    pc.add("Keshav", 7000)
+    store.close()
+    with open(store.journal.path, "r+b") as f:
+        f.seek(-1, 2)
+        f.write(b"\xff")
+
+    pc, ec, store = open_store(tmp_path)
+    assert [p.name for p in pc.players] == ["Aman"]
+    store.close()
+
+
+def test_corruption_before_the_tail_raises(tmp_path):
+    pc, ec, store = open_store(tmp_path)
+    pc.add("Aman", 5000)
+    pc.add("Keshav", 7000)
+    store.close()
+    with open(store.journal.path, "r+b") as f:
+        f.seek(Journal.HEADER.size + 2)
+        f.write(b"\xff")
+        f.seek(0)
+        corrupted = f.read()
+
+    with pytest.raises(Exception, match="corrupt at offset 0"):
+        open_store(tmp_path)
+    with open(store.journal.path, "rb") as f:
+        assert f.read() == corrupted